@@ -14,11 +14,12 @@ from strategies.sitemap_strategy import SitemapStrategy
 from strategies.scraping_strategy import ScrapingStrategy
 from utils.content_consolidator import ContentConsolidator
 from utils.asset_downloader import AssetDownloader
+from utils.session import resolve_per_host_limit
 
 class GitBookMultiDownloader:
     def __init__(self, url, output_file, strategy='auto', section_path=None,
                  max_concurrent=15, delay=0.1, timeout=30, include_assets=False,
-                 keep_temp=False, use_selenium=False, verbose=False):
+                 keep_temp=False, use_selenium=False, per_host_limit=None, verbose=False):
 
         self.url = url.rstrip('/')
         self.output_file = Path(output_file)
@@ -30,31 +31,14 @@ class GitBookMultiDownloader:
         self.include_assets = include_assets
         self.keep_temp = keep_temp
         self.use_selenium = use_selenium
+        self.per_host_limit = per_host_limit
         self.verbose = verbose
 
         self.logger = get_logger()
 
-        # Initialize strategies
-        self.strategies = {
-            'github': GitHubStrategy(verbose=verbose),
-            'sitemap': SitemapStrategy(
-                max_concurrent=max_concurrent,
-                delay=delay, 
-                timeout=timeout,
-                verbose=verbose
-            ),
-            'scraping': ScrapingStrategy(
-                max_concurrent=max_concurrent,
-                delay=delay,
-                timeout=timeout,
-                use_selenium=use_selenium,
-                verbose=verbose
-            )
-        }
-
         # Content processor
         self.consolidator = ContentConsolidator(verbose=verbose)
-        self.asset_downloader = AssetDownloader(verbose=verbose) if include_assets else None
+        self.asset_downloader = None
 
         # Statistics
         self.stats = {
@@ -71,68 +55,76 @@ class GitBookMultiDownloader:
         self.stats['start_time'] = time.time()
 
         try:
-            # Determine which strategies to try
-            if self.strategy == 'auto':
-                strategy_order = ['github', 'sitemap', 'scraping']
-            else:
-                strategy_order = [self.strategy]
-
-            pages = None
-            successful_strategy = None
-
-            # Try each strategy until one succeeds
-            for strategy_name in strategy_order:
-                try:
-                    self.logger.info(f"🔄 Trying {strategy_name} strategy...")
-
-                    strategy = self.strategies[strategy_name]
-                    pages = await strategy.extract_pages(self.url, self.section_path)
-
-                    if pages and len(pages) > 0:
-                        successful_strategy = strategy_name
-                        self.logger.info(f"✅ {strategy_name} strategy succeeded - found {len(pages)} pages")
-                        break
-                    else:
-                        self.logger.warning(f"⚠️  {strategy_name} strategy found no pages")
-
-                except Exception as e:
-                    self.logger.warning(f"❌ {strategy_name} strategy failed: {e}")
-                    if self.verbose:
-                        self.logger.debug(f"Strategy error details: {e}")
-                    continue
-
-            if not pages:
-                raise Exception("All download strategies failed - could not extract any pages")
-
-            self.stats['strategy_used'] = successful_strategy
-            self.stats['pages_downloaded'] = len(pages)
-
-            # Consolidate content
-            self.logger.info("📝 Consolidating content...")
-            final_content = await self.consolidator.consolidate_pages(
-                pages, 
-                self.url, 
-                self.section_path
+            # One session for every phase so connections to the GitBook host
+            # stay warm from strategy detection through asset downloads
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrent,
+                limit_per_host=resolve_per_host_limit(self.max_concurrent, self.per_host_limit),
+                ttl_dns_cache=300,
+                keepalive_timeout=30
             )
 
-            # Download assets if requested
-            if self.include_assets and self.asset_downloader:
-                self.logger.info("🖼️  Downloading assets...")
-                assets_downloaded = await self.asset_downloader.download_assets(
+            async with aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                # Determine which strategies to try
+                if self.strategy == 'auto':
+                    strategy_order = ['github', 'sitemap', 'scraping']
+                else:
+                    strategy_order = [self.strategy]
+
+                pages = None
+                successful_strategy = None
+
+                # Try each strategy until one succeeds
+                for strategy_name in strategy_order:
+                    try:
+                        self.logger.info(f"🔄 Trying {strategy_name} strategy...")
+
+                        strategy = self._create_strategy(strategy_name, session)
+                        pages = await strategy.extract_pages(self.url, self.section_path)
+
+                        if pages and len(pages) > 0:
+                            successful_strategy = strategy_name
+                            self.logger.info(f"✅ {strategy_name} strategy succeeded - found {len(pages)} pages")
+                            break
+                        else:
+                            self.logger.warning(f"⚠️  {strategy_name} strategy found no pages")
+
+                    except Exception as e:
+                        self.logger.warning(f"❌ {strategy_name} strategy failed: {e}")
+                        if self.verbose:
+                            self.logger.debug(f"Strategy error details: {e}")
+                        continue
+
+                if not pages:
+                    raise Exception("All download strategies failed - could not extract any pages")
+
+                self.stats['strategy_used'] = successful_strategy
+                self.stats['pages_downloaded'] = len(pages)
+
+                # Download assets if requested
+                if self.include_assets:
+                    self.logger.info("🖼️  Downloading assets...")
+                    self.asset_downloader = AssetDownloader(session=session, verbose=self.verbose)
+                    assets_downloaded = await self.asset_downloader.download_assets(
+                        pages, 
+                        self.output_file.parent / 'assets'
+                    )
+                    self.stats['assets_downloaded'] = assets_downloaded
+
+            # Consolidate content, streaming it straight to the output file
+            self.logger.info("📝 Consolidating content...")
+            with open(self.output_file, 'w', encoding='utf-8') as f:
+                async for chunk in self.consolidator.iter_sections(
                     pages, 
-                    self.output_file.parent / 'assets'
-                )
-                self.stats['assets_downloaded'] = assets_downloaded
-
-                # Update content with asset paths
-                final_content = self.asset_downloader.update_asset_references(
-                    final_content, 'assets'
-                )
+                    self.url, 
+                    self.section_path
+                ):
+                    if self.include_assets and self.asset_downloader:
+                        # Update content with asset paths
+                        chunk = self.asset_downloader.update_asset_references(chunk, 'assets')
 
-            # Write final file
-            self.logger.info("💾 Writing output file...")
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                f.write(final_content)
+                    f.write(chunk)
 
             # Cleanup temporary files if not keeping them
             if not self.keep_temp:
@@ -156,6 +148,35 @@ class GitBookMultiDownloader:
             self._cleanup_temp_files()
             raise
 
+    def _create_strategy(self, name, session):
+        """Instantiate a download strategy bound to the shared session"""
+        if name == 'github':
+            return GitHubStrategy(session=session, verbose=self.verbose)
+
+        if name == 'sitemap':
+            return SitemapStrategy(
+                max_concurrent=self.max_concurrent,
+                delay=self.delay, 
+                timeout=self.timeout,
+                per_host_limit=self.per_host_limit,
+                session=session,
+                verbose=self.verbose
+            )
+
+        if name == 'scraping':
+            return ScrapingStrategy(
+                max_concurrent=self.max_concurrent,
+                delay=self.delay,
+                timeout=self.timeout,
+                use_selenium=self.use_selenium,
+                per_host_limit=self.per_host_limit,
+                keep_html=self.include_assets,
+                session=session,
+                verbose=self.verbose
+            )
+
+        raise ValueError(f"Unknown strategy: {name}")
+
     def _cleanup_temp_files(self):
         """Clean up any temporary files/directories"""
         temp_dirs = ['temp_repo', 'temp_download', 'selenium_temp']
@@ -37,6 +37,7 @@ Examples:
                        default='auto', help='Download strategy (default: auto - tries all)')
     parser.add_argument('--section-path', help='Only process specific section/directory')
     parser.add_argument('--max-concurrent', type=int, default=15, help='Max concurrent requests')
+    parser.add_argument('--per-host-limit', type=int, help='Max concurrent connections per host, 0 for no per-host cap (default: min(max-concurrent, 10))')
     parser.add_argument('--delay', type=float, default=0.1, help='Delay between requests')
     parser.add_argument('--timeout', type=int, default=30, help='Request timeout')
     parser.add_argument('--include-assets', action='store_true', help='Download images/assets')
@@ -66,6 +67,7 @@ Examples:
         include_assets=args.include_assets,
         keep_temp=args.keep_temp,
         use_selenium=args.use_selenium,
+        per_host_limit=args.per_host_limit,
         verbose=args.verbose
     )
 
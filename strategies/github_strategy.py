@@ -3,16 +3,18 @@ GitHub Strategy - Clone source repository when available
 """
 
 import asyncio
-import aiohttp
 import git
 import shutil
 from pathlib import Path
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
 from utils.logger import get_logger
+from utils.session import session_scope
 
 class GitHubStrategy:
-    def __init__(self, verbose=False):
+    def __init__(self, session=None, verbose=False):
+        # Optional aiohttp session shared with the caller
+        self.session = session
         self.verbose = verbose
         self.logger = get_logger()
 
@@ -40,7 +42,7 @@ class GitHubStrategy:
     async def _detect_github_repo(self, url):
         """Detect GitHub repository from GitBook page"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(30)) as session:
+            async with session_scope(self.session, 30) as session:
                 async with session.get(url) as response:
                     if response.status != 200:
                         return None
@@ -4,22 +4,101 @@ Enhanced Scraping Strategy - Web scraping with navigation discovery
 
 import asyncio
 import aiohttp
+import os
+import random
 import re
+from functools import lru_cache
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+import lxml.html
+from cssselect import HTMLTranslator
+from lxml import etree
+from lxml.cssselect import CSSSelector
+from markdownify import MarkdownConverter
 from utils.logger import get_logger
+from utils.session import resolve_per_host_limit, session_scope
+
+# HTML to markdown converter. It re-parses the serialized content with
+# BeautifulSoup (lxml tree builder) and converts it in pure Python.
+_MARKDOWN = MarkdownConverter(heading_style='ATX', bullets='-', bs4_options='lxml')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_XML_DECL_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+# Non-content URLs skipped during navigation discovery
+_SKIP_RE = re.compile(
+    r'/search|/login|/logout|/edit|/admin|/api/|/assets/|/static/'
+    r'|\.(?:css|js|json|xml|rss|txt|jpg|png|gif|svg|ico|pdf)$'
+    r'|^(?:mailto|tel|javascript):'
+)
+
+# Elements stripped from a page before extracting its content. Plain tags
+# are stripped by libxml2 directly; only the class selectors need matching.
+_UNWANTED_TAGS = ['nav', 'header', 'footer', 'aside', 'script', 'style', 'noscript']
+_UNWANTED_SELECTORS = [
+    '.sidebar', '.navigation', '.nav', '.header', '.footer',
+    '.breadcrumb', '.breadcrumbs', '.page-edit-link',
+    '.search', '.share', '.comments'
+]
+
+# Main content containers, in order of preference
+_CONTENT_SELECTORS = [
+    '[data-testid="page-content"]',
+    '.page-content',
+    '.content',
+    'main',
+    'article',
+    '.post-content',
+    '.entry-content'
+]
+
+# Each list is matched in a single tree walk
+_UNWANTED_QUERY = CSSSelector(', '.join(_UNWANTED_SELECTORS))
+_CONTENT_QUERY = CSSSelector(', '.join(_CONTENT_SELECTORS))
+_CONTENT_TESTS = [etree.XPath(HTMLTranslator().css_to_xpath(selector, prefix='self::'))
+                  for selector in _CONTENT_SELECTORS]
+
+def _parse_document(html):
+    """Parse a decoded HTML page with lxml
+
+    lxml refuses str input carrying an XML encoding declaration (common on
+    XHTML pages); the text is already decoded, so the declaration is dropped.
+    """
+    return lxml.html.document_fromstring(_XML_DECL_RE.sub('', html, count=1))
+
+@lru_cache(maxsize=None)
+def _same_site_re(base_domain):
+    """Regex matching http(s) URLs whose netloc is exactly base_domain"""
+    return re.compile(r'(?i:https?)://' + re.escape(base_domain) + r'(?:[/?#]|$)')
+
+def _content_rank(element):
+    """Index of the first content selector an element matches"""
+    return next(i for i, test in enumerate(_CONTENT_TESTS) if test(element))
+
+class RecoverableError(Exception):
+    """Transient fetch failure (HTTP 429/5xx) that is worth retrying"""
 
 class ScrapingStrategy:
     def __init__(self, max_concurrent=15, delay=0.1, timeout=30, 
-                 use_selenium=False, verbose=False):
+                 use_selenium=False, per_host_limit=None, max_retries=3,
+                 retry_base_delay=1.0, retry_max_delay=30.0, retry_jitter=0.5,
+                 keep_html=False, session=None, verbose=False):
         self.max_concurrent = max_concurrent
+        self.per_host_limit = resolve_per_host_limit(max_concurrent, per_host_limit)
         self.delay = delay
         self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.retry_jitter = retry_jitter
         self.use_selenium = use_selenium
+        # Raw HTML is only needed downstream for asset discovery
+        self.keep_html = keep_html
+        # Optional aiohttp session shared with the caller
+        self.session = session
         self.verbose = verbose
         self.logger = get_logger()
 
-        # Navigation selectors for different GitBook layouts
+        # Navigation selectors for different GitBook layouts, most likely hit first -
+        # discovery stops at the first selector yielding enough distinct links
         self.nav_selectors = [
             # Modern GitBook
             '[data-testid="sidebar"] a[href]',
@@ -37,12 +116,29 @@ class ScrapingStrategy:
             '.toc a[href]',
             'aside a[href]',
         ]
+        self._nav_queries = [CSSSelector(selector) for selector in self.nav_selectors]
 
     async def extract_pages(self, url, section_path=None):
         """Extract pages using web scraping"""
         try:
+            return await self._run(url, section_path)
+
+        except Exception as e:
+            self.logger.debug(f"Scraping strategy error: {e}")
+            return None
+
+    async def _run(self, url, section_path):
+        """Discover and download pages over a single shared session"""
+        # One connector for the whole crawl so connections are kept alive
+        # and reused instead of paying a new handshake per page. With an
+        # injected session these options are unused - its connector wins.
+        async with session_scope(self.session, self.timeout,
+                                 limit=self.max_concurrent,
+                                 limit_per_host=self.per_host_limit,
+                                 ttl_dns_cache=300,
+                                 keepalive_timeout=30) as session:
             # Step 1: Discover navigation links
-            nav_links = await self._discover_navigation(url)
+            nav_links = await self._discover_navigation(session, url)
 
             if not nav_links:
                 # Fallback - at least get the main page
@@ -54,64 +150,56 @@ class ScrapingStrategy:
                            if section_path.lower() in link['url'].lower()]
 
             # Step 3: Download all pages
-            pages = await self._download_pages(nav_links)
+            pages = await self._download_pages(session, nav_links)
 
             return pages
 
-        except Exception as e:
-            self.logger.debug(f"Scraping strategy error: {e}")
-            return None
-
-    async def _discover_navigation(self, url):
+    async def _discover_navigation(self, session, url):
         """Discover navigation links from the main page"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        return []
+            async with session.get(url) as response:
+                if response.status != 200:
+                    return []
 
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
+                html = await self._read_html(response)
+                if html is None:
+                    return []
 
-                    links = []
-                    base_domain = urlparse(url).netloc
+                tree = _parse_document(html)
 
-                    # Try each navigation selector
-                    for selector in self.nav_selectors:
-                        nav_links = soup.select(selector)
+                links = []
+                seen = set()
+                base_domain = urlparse(url).netloc
 
-                        for link in nav_links:
-                            href = link.get('href', '')
-                            text = link.get_text().strip()
+                # Try each navigation selector
+                for query in self._nav_queries:
+                    nav_links = query(tree)
 
-                            if not href or not text:
-                                continue
+                    for link in nav_links:
+                        href = link.get('href', '')
+                        if not href:
+                            continue
 
-                            # Convert to absolute URL
-                            abs_url = urljoin(url, href)
+                        # Convert to absolute URL, skipping ones already collected
+                        abs_url = urljoin(url, href)
+                        if abs_url in seen:
+                            continue
 
-                            # Validate URL
-                            if self._is_valid_page_url(abs_url, base_domain):
-                                links.append({
-                                    'url': abs_url,
-                                    'title': text[:100]  # Limit title length
-                                })
+                        text = link.text_content().strip()
+                        if not text:
+                            continue
 
-                        # If we found good links with this selector, use them
-                        if len(links) > 5:
-                            break
+                        # Validate URL
+                        if self._is_valid_page_url(abs_url, base_domain):
+                            seen.add(abs_url)
+                            links.append({'url': abs_url, 'title': text[:100]})  # Limit title length
 
-                    # Remove duplicates
-                    unique_links = []
-                    seen_urls = set()
+                    # If we found enough distinct links with this selector, use them
+                    if len(seen) > 5:
+                        break
 
-                    for link in links:
-                        if link['url'] not in seen_urls:
-                            unique_links.append(link)
-                            seen_urls.add(link['url'])
-
-                    self.logger.info(f"Discovered {len(unique_links)} navigation links")
-                    return unique_links
+                self.logger.info(f"Discovered {len(links)} navigation links")
+                return links
 
         except Exception as e:
             self.logger.debug(f"Navigation discovery error: {e}")
@@ -122,148 +210,163 @@ class ScrapingStrategy:
         if not url or url.startswith('#'):
             return False
 
-        parsed = urlparse(url)
-
-        # Must be same domain
-        if parsed.netloc != base_domain:
+        # Must be an http(s) URL on the same domain
+        if not _same_site_re(base_domain).match(url):
             return False
 
         # Skip non-content URLs
-        skip_patterns = [
-            r'/search', r'/login', r'/logout', r'/edit',
-            r'/admin', r'/api/', r'/assets/', r'/static/',
-            r'\.(css|js|json|xml|rss|txt)$',
-            r'\.(jpg|png|gif|svg|ico|pdf)$',
-            r'mailto:', r'tel:', r'javascript:'
-        ]
-
-        url_lower = url.lower()
-        for pattern in skip_patterns:
-            if re.search(pattern, url_lower):
-                return False
+        if _SKIP_RE.search(url.lower()):
+            return False
 
         return True
 
-    async def _download_pages(self, nav_links):
-        """Download content from all navigation links"""
-        semaphore = asyncio.Semaphore(self.max_concurrent)
+    async def _download_pages(self, session, nav_links):
+        """Download content from all navigation links
+
+        Fetching and extraction run as a pipeline: downloads feed raw HTML
+        through a bounded queue to extraction workers, so fetchers wait
+        whenever extraction falls behind instead of piling up page sources.
+        """
         pages = []
+        html_queue = asyncio.Queue(maxsize=self.max_concurrent * 2)
+
+        # Requests must not be started until a connection is free - time spent
+        # queued in the pool counts against the request timeout. per_host_limit
+        # is what the connector serves this host, never more than max_concurrent.
+        semaphore = asyncio.Semaphore(self.per_host_limit)
 
         async def download_page(link):
             async with semaphore:
-                await asyncio.sleep(self.delay)
+                # Jittered delay so requests don't arrive at the host in bursts
+                await asyncio.sleep(random.uniform(0, self.delay))
 
                 try:
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-                        async with session.get(link['url']) as response:
-                            if response.status == 200:
-                                html = await response.text()
-                                content = self._extract_main_content(html)
-
-                                if content and len(content.strip()) > 50:  # Minimum content length
-                                    pages.append({
-                                        'title': link['title'],
-                                        'url': link['url'],
-                                        'content': content,
-                                        'source': 'scraping',
-                                        'html': html
-                                    })
-
+                    html = await self._fetch_html(session, link['url'])
                 except Exception as e:
                     self.logger.debug(f"Error downloading {link['url']}: {e}")
+                    return
+
+                if html is not None:
+                    await html_queue.put((link, html))
 
-        # Download all pages concurrently
-        tasks = [download_page(link) for link in nav_links]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        async def extract_worker():
+            while True:
+                item = await html_queue.get()
+                if item is None:
+                    return
+
+                link, html = item
+                try:
+                    # Parse off the event loop so CPU work doesn't stall fetches
+                    content = await asyncio.to_thread(self._extract_main_content, html)
+                except Exception as e:
+                    self.logger.debug(f"Error extracting {link['url']}: {e}")
+                    continue
+
+                if content and len(content.strip()) > 50:  # Minimum content length
+                    page = {
+                        'title': link['title'],
+                        'url': link['url'],
+                        'content': content,
+                        'source': 'scraping'
+                    }
+                    if self.keep_html:
+                        page['html'] = html
+                    pages.append(page)
+
+        workers = [asyncio.create_task(extract_worker())
+                   for _ in range(min(self.max_concurrent, os.cpu_count() or 1))]
+
+        try:
+            # Download all pages concurrently
+            tasks = [download_page(link) for link in nav_links]
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            # One sentinel per worker once every page has been queued
+            for _ in workers:
+                await html_queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
 
         return pages
 
+    async def _fetch_html(self, session, url):
+        """Fetch a page, retrying transient failures with exponential backoff
+
+        Returns the page HTML, or None for non-recoverable statuses (404, 403...)
+        and non-HTML responses.
+        """
+        for attempt in range(self.max_retries):
+            try:
+                async with session.get(url) as response:
+                    if response.status == 429 or 500 <= response.status < 600:
+                        raise RecoverableError(f"HTTP {response.status}")
+                    if response.status != 200:
+                        return None
+                    return await self._read_html(response)
+
+            except (RecoverableError, aiohttp.ClientConnectionError,
+                    aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries - 1:
+                    raise
+
+                delay = min(
+                    self.retry_base_delay * (2 ** attempt) * (1 + random.random() * self.retry_jitter),
+                    self.retry_max_delay
+                )
+                self.logger.debug(f"Retrying {url} in {delay:.1f}s ({e!r})")
+                await asyncio.sleep(delay)
+
+    async def _read_html(self, response):
+        """Read an HTML response body, or None if the response isn't HTML
+
+        Decodes once with the declared charset, skipping aiohttp's charset
+        detection and never touching bodies that would be discarded.
+        """
+        # A missing header still counts as HTML; content_type is parsed and lowercased
+        if 'Content-Type' in response.headers and 'html' not in response.content_type:
+            return None
+
+        raw = await response.read()
+        try:
+            return raw.decode(response.charset or 'utf-8', errors='replace')
+        except LookupError:
+            # Unknown charset label
+            return raw.decode('utf-8', errors='replace')
+
     def _extract_main_content(self, html):
         """Extract main content from HTML page"""
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Remove unwanted elements
-        unwanted_selectors = [
-            'nav', 'header', 'footer', 'aside', 
-            '.sidebar', '.navigation', '.nav', '.header', '.footer',
-            '.breadcrumb', '.breadcrumbs', '.page-edit-link',
-            'script', 'style', 'noscript',
-            '.search', '.share', '.comments'
-        ]
+        tree = _parse_document(html)
 
-        for selector in unwanted_selectors:
-            for element in soup.select(selector):
-                element.decompose()
+        # Remove unwanted elements (keeping any text that follows them)
+        etree.strip_elements(tree, *_UNWANTED_TAGS, with_tail=False)
+        for element in _UNWANTED_QUERY(tree):
+            element.drop_tree()
 
         # Find main content area
-        content_selectors = [
-            '[data-testid="page-content"]',
-            '.page-content',
-            '.content',
-            'main',
-            'article',
-            '.post-content',
-            '.entry-content'
-        ]
+        matches = _CONTENT_QUERY(tree)
+        if matches:
+            # Matches come back in document order - honour selector priority instead
+            content_elem = matches[0] if len(matches) == 1 else min(matches, key=_content_rank)
 
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                # Convert to markdown-like text
-                return self._html_to_text(content_elem)
+            # Convert to markdown-like text
+            return self._html_to_text(content_elem)
 
         # Fallback - use body content
-        body = soup.find('body')
-        if body:
+        body = tree.find('body')
+        if body is not None:
             return self._html_to_text(body)
 
-        return soup.get_text()
+        return tree.text_content()
 
     def _html_to_text(self, element):
-        """Convert HTML element to clean text with basic markdown formatting"""
-        # This is a simple HTML to text converter
-        # For production, you might want to use a proper HTML-to-markdown library
-
-        text_lines = []
-
-        def process_element(elem):
-            if elem.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                level = int(elem.name[1])
-                heading = '#' * level + ' ' + elem.get_text().strip()
-                text_lines.append(heading)
-                text_lines.append('')
-            elif elem.name == 'p':
-                text_lines.append(elem.get_text().strip())
-                text_lines.append('')
-            elif elem.name in ['ul', 'ol']:
-                for li in elem.find_all('li', recursive=False):
-                    text_lines.append('- ' + li.get_text().strip())
-                text_lines.append('')
-            elif elem.name == 'code':
-                text_lines.append('`' + elem.get_text().strip() + '`')
-            elif elem.name == 'pre':
-                code_text = elem.get_text().strip()
-                text_lines.append('```')
-                text_lines.append(code_text)
-                text_lines.append('```')
-                text_lines.append('')
-            else:
-                # For other elements, just get the text
-                for child in elem.children:
-                    if hasattr(child, 'name') and child.name:
-                        process_element(child)
-                    else:
-                        # Text node
-                        text = str(child).strip()
-                        if text:
-                            text_lines.append(text)
-
-        process_element(element)
-
-        # Join and clean up
-        result = '\n'.join(text_lines)
+        """Convert HTML element to markdown"""
+        html = lxml.html.tostring(element, encoding='unicode', with_tail=False)
+        result = _MARKDOWN.convert(html)
 
         # Remove excessive blank lines
-        result = re.sub(r'\n{3,}', '\n\n', result)
+        result = _BLANK_LINES_RE.sub('\n\n', result)
 
         return result.strip()
@@ -3,51 +3,56 @@ Sitemap Strategy - Download pages listed in sitemap.xml
 """
 
 import asyncio
-import aiohttp
 import re
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 from utils.logger import get_logger
+from utils.session import resolve_per_host_limit, session_scope
 
 class SitemapStrategy:
-    def __init__(self, max_concurrent=15, delay=0.1, timeout=30, verbose=False):
+    def __init__(self, max_concurrent=15, delay=0.1, timeout=30, per_host_limit=None,
+                 session=None, verbose=False):
         self.max_concurrent = max_concurrent
+        self.per_host_limit = resolve_per_host_limit(max_concurrent, per_host_limit)
         self.delay = delay
         self.timeout = timeout
+        # Optional aiohttp session shared with the caller
+        self.session = session
         self.verbose = verbose
         self.logger = get_logger()
 
     async def extract_pages(self, url, section_path=None):
         """Extract pages from sitemap.xml"""
         try:
-            # Find sitemap URLs
-            sitemap_urls = await self._find_sitemaps(url)
-            if not sitemap_urls:
-                return None
+            async with session_scope(self.session, self.timeout) as session:
+                # Find sitemap URLs
+                sitemap_urls = await self._find_sitemaps(session, url)
+                if not sitemap_urls:
+                    return None
 
-            # Extract page URLs from sitemaps
-            page_urls = []
-            for sitemap_url in sitemap_urls:
-                urls = await self._parse_sitemap(sitemap_url)
-                page_urls.extend(urls)
+                # Extract page URLs from sitemaps
+                page_urls = []
+                for sitemap_url in sitemap_urls:
+                    urls = await self._parse_sitemap(session, sitemap_url)
+                    page_urls.extend(urls)
 
-            if not page_urls:
-                return None
+                if not page_urls:
+                    return None
 
-            # Filter by section if specified
-            if section_path:
-                page_urls = [u for u in page_urls if section_path in u]
+                # Filter by section if specified
+                if section_path:
+                    page_urls = [u for u in page_urls if section_path in u]
 
-            # Download pages
-            pages = await self._download_pages(page_urls)
+                # Download pages
+                pages = await self._download_pages(session, page_urls)
 
-            return pages
+                return pages
 
         except Exception as e:
             self.logger.debug(f"Sitemap strategy error: {e}")
             return None
 
-    async def _find_sitemaps(self, base_url):
+    async def _find_sitemaps(self, session, base_url):
         """Find sitemap.xml URLs"""
         sitemap_paths = [
             '/sitemap.xml',
@@ -56,97 +61,100 @@ class SitemapStrategy:
         ]
 
         sitemaps = []
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-            for path in sitemap_paths:
-                sitemap_url = urljoin(base_url, path)
-                try:
-                    async with session.get(sitemap_url) as response:
-                        if response.status == 200:
-                            content = await response.text()
-                            if '<urlset' in content or '<sitemapindex' in content:
-                                sitemaps.append(sitemap_url)
-                                self.logger.debug(f"Found sitemap: {sitemap_url}")
-                except:
-                    continue
+        for path in sitemap_paths:
+            sitemap_url = urljoin(base_url, path)
+            try:
+                async with session.get(sitemap_url) as response:
+                    if response.status == 200:
+                        content = await response.text()
+                        if '<urlset' in content or '<sitemapindex' in content:
+                            sitemaps.append(sitemap_url)
+                            self.logger.debug(f"Found sitemap: {sitemap_url}")
+            except:
+                continue
 
         return sitemaps
 
-    async def _parse_sitemap(self, sitemap_url):
+    async def _parse_sitemap(self, session, sitemap_url):
         """Parse sitemap XML and extract page URLs"""
         urls = []
 
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-                async with session.get(sitemap_url) as response:
-                    if response.status != 200:
-                        return []
-
-                    content = await response.text()
-                    soup = BeautifulSoup(content, 'xml')
-
-                    # Handle sitemap index
-                    sitemap_tags = soup.find_all('sitemap')
-                    if sitemap_tags:
-                        # This is a sitemap index, recurse
-                        for sitemap_tag in sitemap_tags:
-                            loc = sitemap_tag.find('loc')
-                            if loc:
-                                child_urls = await self._parse_sitemap(loc.text)
-                                urls.extend(child_urls)
-                    else:
-                        # Regular sitemap with URLs
-                        url_tags = soup.find_all('url')
-                        for url_tag in url_tags:
-                            loc = url_tag.find('loc')
-                            if loc:
-                                urls.append(loc.text)
+            async with session.get(sitemap_url) as response:
+                if response.status != 200:
+                    return []
+
+                content = await response.text()
+
+            soup = BeautifulSoup(content, 'xml')
+
+            # Handle sitemap index
+            sitemap_tags = soup.find_all('sitemap')
+            if sitemap_tags:
+                # This is a sitemap index, recurse
+                for sitemap_tag in sitemap_tags:
+                    loc = sitemap_tag.find('loc')
+                    if loc:
+                        child_urls = await self._parse_sitemap(session, loc.text)
+                        urls.extend(child_urls)
+            else:
+                # Regular sitemap with URLs
+                url_tags = soup.find_all('url')
+                for url_tag in url_tags:
+                    loc = url_tag.find('loc')
+                    if loc:
+                        urls.append(loc.text)
 
         except Exception as e:
             self.logger.debug(f"Error parsing sitemap {sitemap_url}: {e}")
 
         return urls
 
-    async def _download_pages(self, urls):
+    async def _download_pages(self, session, urls):
         """Download content from page URLs"""
-        semaphore = asyncio.Semaphore(self.max_concurrent)
+        # Bounded by what a shared session's connector serves one host, so
+        # requests never wait in the pool against the request timeout
+        semaphore = asyncio.Semaphore(self.per_host_limit)
         pages = []
 
-        async def download_page(url):
+        async def download_page(order, url):
             async with semaphore:
                 await asyncio.sleep(self.delay)
 
                 try:
                     # Construct .md URL instead of HTML
                     md_url = url.rstrip('/') + '.md'
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-                        async with session.get(md_url) as response:
-                            if response.status == 200:
-                                md = await response.text()
-                                title = self._extract_title(md) or md_url
+                    async with session.get(md_url) as response:
+                        if response.status == 200:
+                            md = await response.text()
+                            title = self._extract_title(md) or md_url
+                            pages.append({
+                                'title': title,
+                                'url': md_url,
+                                'content': md,
+                                'source': 'sitemap-md',
+                                'order': order
+                            })
+                            return
+                    # Fallback to HTML if Markdown not available
+                    async with session.get(url) as response:
+                        if response.status == 200:
+                            html = await response.text()
+                            content = self._extract_content(html)
+                            if content:
                                 pages.append({
-                                    'title': title,
-                                    'url': md_url,
-                                    'content': md,
-                                    'source': 'sitemap-md'
+                                    'title': self._extract_title(html),
+                                    'url': url,
+                                    'content': content,
+                                    'source': 'sitemap-html',
+                                    'order': order
                                 })
-                                return
-                        # Fallback to HTML if Markdown not available
-                        async with session.get(url) as response:
-                            if response.status == 200:
-                                html = await response.text()
-                                content = self._extract_content(html)
-                                if content:
-                                    pages.append({
-                                        'title': self._extract_title(html),
-                                        'url': url,
-                                        'content': content,
-                                        'source': 'sitemap-html'
-                                    })
                 except Exception as e:
                     self.logger.debug(f"Error downloading {url}: {e}")
 
         # Download all pages concurrently
-        tasks = [download_page(url) for url in urls]
+        # Pages finish out of order - remember each one's sitemap position
+        tasks = [download_page(order, url) for order, url in enumerate(urls)]
         await asyncio.gather(*tasks, return_exceptions=True)
 
         return pages
@@ -3,14 +3,16 @@ Asset Downloader - Downloads and manages images and other assets
 """
 
 import asyncio
-import aiohttp
 import re
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 from utils.logger import get_logger
+from utils.session import session_scope
 
 class AssetDownloader:
-    def __init__(self, verbose=False):
+    def __init__(self, session=None, verbose=False):
+        # Optional aiohttp session shared with the caller
+        self.session = session
         self.verbose = verbose
         self.logger = get_logger()
 
@@ -41,7 +43,7 @@ class AssetDownloader:
         downloaded_count = 0
         semaphore = asyncio.Semaphore(10)  # Limit concurrent downloads
 
-        async def download_asset(url):
+        async def download_asset(session, url):
             nonlocal downloaded_count
 
             async with semaphore:
@@ -61,26 +63,26 @@ class AssetDownloader:
                         return
 
                     # Download
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(30)) as session:
-                        async with session.get(url) as response:
-                            if response.status == 200:
-                                content = await response.read()
+                    async with session.get(url) as response:
+                        if response.status == 200:
+                            content = await response.read()
 
-                                # Write file
-                                with open(asset_path, 'wb') as f:
-                                    f.write(content)
+                            # Write file
+                            with open(asset_path, 'wb') as f:
+                                f.write(content)
 
-                                downloaded_count += 1
+                            downloaded_count += 1
 
-                                if self.verbose:
-                                    self.logger.debug(f"Downloaded: {filename}")
+                            if self.verbose:
+                                self.logger.debug(f"Downloaded: {filename}")
 
                 except Exception as e:
                     self.logger.debug(f"Failed to download {url}: {e}")
 
         # Download all assets
-        tasks = [download_asset(url) for url in asset_urls]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        async with session_scope(self.session, 30) as session:
+            tasks = [download_asset(session, url) for url in asset_urls]
+            await asyncio.gather(*tasks, return_exceptions=True)
 
         return downloaded_count
 
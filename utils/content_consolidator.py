@@ -4,9 +4,21 @@ Content Consolidator - Combines pages into a single markdown document
 
 import re
 from datetime import datetime
+from operator import itemgetter
 from pathlib import Path
 from utils.logger import get_logger
 
+# Title heuristics used when sorting pages (substring matches on the lowercased title)
+_INTRO_WORDS_RE = re.compile('readme|introduction|intro|start|index')
+_START_WORDS_RE = re.compile('getting started|quick start|overview')
+_NUMBER_RE = re.compile(r'(\d+)')
+
+# Content normalization
+_LEADING_HASH_RE = re.compile(r'\s*#')
+_HEAD_RE = re.compile(r'^(?=#{1,5}[^\S\n])', re.MULTILINE)
+_BLANK_RE = re.compile(r'\n{4,}')
+_TOO_DEEP_RE = re.compile(r'^#{7,}', re.MULTILINE)
+
 class ContentConsolidator:
     def __init__(self, verbose=False):
         self.verbose = verbose
@@ -14,17 +26,32 @@ class ContentConsolidator:
 
     async def consolidate_pages(self, pages, base_url, section_path=None):
         """Consolidate all pages into a single markdown document"""
+        return ''.join([chunk async for chunk in self.iter_sections(pages, base_url, section_path)])
+
+    async def iter_sections(self, pages, base_url, section_path=None):
+        """Yield the consolidated document in chunks - the header, then one per page
+
+        Chunks are already post-processed and can be written out as they arrive,
+        so the full document never has to be held in memory.
+        """
         if not pages:
-            return "# No Content Found\n\nNo pages were successfully downloaded."
+            yield "# No Content Found\n\nNo pages were successfully downloaded."
+            return
 
-        # Sort pages for logical order
-        sorted_pages = self._sort_pages(pages)
+        # Sort pages for logical order, trusting the source's own order when it has one
+        if all(page.get('order') is not None for page in pages):
+            sorted_pages = sorted(pages, key=itemgetter('order'))
+        else:
+            sorted_pages = self._sort_pages(pages)
 
-        # Generate document
-        content_parts = []
+        # Trailing whitespace held back from the previous chunk
+        pending = ''
 
         # Add header
-        content_parts.append(self._generate_header(base_url, section_path, len(pages)))
+        chunk, pending = self._post_process_chunk(
+            self._generate_header(base_url, section_path, len(pages)) + "\n", pending
+        )
+        yield chunk
 
         # Generate table of contents
         # toc = self._generate_toc(sorted_pages)
@@ -35,16 +62,14 @@ class ContentConsolidator:
 
         # Add each page
         for i, page in enumerate(sorted_pages, 1):
-            page_content = self._process_page_content(page, i)
-            if page_content:
-                content_parts.append(page_content)
-                content_parts.append("\n---\n")
-
-        # Combine and clean up
-        final_content = "\n".join(content_parts)
-        final_content = self._post_process_content(final_content)
+            page_parts = self._process_page_content(page, i)
+            if page_parts:
+                page_parts.append("\n\n---\n\n")
+                chunk, pending = self._post_process_chunk(''.join(page_parts), pending)
+                yield chunk
 
-        return final_content
+        # Ensure document ends cleanly
+        yield "\n"
 
     def _generate_header(self, base_url, section_path, page_count):
         """Generate document header"""
@@ -81,15 +106,14 @@ class ContentConsolidator:
             score = 0
 
             # Prioritize certain page types
-            if any(word in title for word in ['readme', 'introduction', 'intro', 'start', 'index']):
+            if _INTRO_WORDS_RE.search(title):
                 score += 1000
 
-            if any(word in title for word in ['getting started', 'quick start', 'overview']):
+            if _START_WORDS_RE.search(title):
                 score += 900
 
             # Try to extract numeric prefixes
-            import re
-            numeric_match = re.search(r'(\d+)', title)
+            numeric_match = _NUMBER_RE.search(title)
             if numeric_match:
                 score += 800 - int(numeric_match.group(1))
 
@@ -118,7 +142,7 @@ class ContentConsolidator:
         return "\n".join(toc_lines)
 
     def _process_page_content(self, page, page_num):
-        """Process individual page content"""
+        """Process individual page content into a list of string parts"""
         title = page['title']
         content = page.get('content', '')
         source = page.get('source', 'unknown')
@@ -136,61 +160,66 @@ class ContentConsolidator:
 
         # Add source info
         if page.get('url'):
-            section_parts.append(f"*Source: {page['url']}*\n")
+            section_parts.extend((f"*Source: {page['url']}*\n", "\n"))
         elif page.get('path'):
-            section_parts.append(f"*Source: {page['path']}*\n")
+            section_parts.extend((f"*Source: {page['path']}*\n", "\n"))
 
         # section_parts.append(f"*Method: {source}*\n\n")
 
         # Process content
         processed_content = self._clean_content(content)
+        if not section_parts and not processed_content:
+            return None
         section_parts.append(processed_content)
 
-        return "\n".join(section_parts)
+        # Left unjoined (with explicit separators) so the caller joins once
+        return section_parts
 
     def _clean_content(self, content):
         """Clean and normalize content"""
-        # Remove any existing title headers at the start
-        lines = content.split('\n')
-
-        # Skip initial empty lines and top-level headers
-        start_idx = 0
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('# '):
-                start_idx = i + 1
-                continue
-            break
-
-        if start_idx > 0:
-            lines = lines[start_idx:]
+        # Remove any existing title headers at the start. Only possible when the
+        # first non-blank character is '#', so most pages skip the line split.
+        if _LEADING_HASH_RE.match(content):
+            lines = content.split('\n')
+
+            # Skip initial empty lines and top-level headers
+            start_idx = 0
+            for i, line in enumerate(lines):
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith('# '):
+                    start_idx = i + 1
+                    continue
+                break
+
+            if start_idx > 0:
+                content = '\n'.join(lines[start_idx:])
 
         # Adjust heading levels (bump everything down by 1)
-        adjusted_lines = []
-        for line in lines:
-            if re.match(r'^#{1,5}\s', line):
-                adjusted_lines.append('#' + line)
-            else:
-                adjusted_lines.append(line)
-
-        content = '\n'.join(adjusted_lines)
+        if '#' in content:
+            content = _HEAD_RE.sub('#', content)
 
         # Clean up excessive whitespace
-        content = re.sub(r'\n{4,}', '\n\n\n', content)
+        content = _BLANK_RE.sub('\n\n\n', content)
 
         return content.strip()
 
-    def _post_process_content(self, content):
-        """Final post-processing of the complete document"""
+    def _post_process_chunk(self, chunk, pending):
+        """Post-process one chunk of the streamed document
+
+        Trailing whitespace is held back and returned as the new ``pending``
+        so that blank-line runs spanning chunks are collapsed as if the
+        document had been processed whole. Chunks always end on a line
+        boundary, so ``^`` anchors stay correct.
+        """
+        content = pending + chunk
+
         # Remove excessive whitespace
-        content = re.sub(r'\n{4,}', '\n\n\n', content)
+        content = _BLANK_RE.sub('\n\n\n', content)
 
         # Fix any broken markdown
-        content = re.sub(r'^#{7,}', '######', content, flags=re.MULTILINE)
-
-        # Ensure document ends cleanly
-        content = content.rstrip() + '\n'
+        content = _TOO_DEEP_RE.sub('######', content)
 
-        return content
+        body = content.rstrip()
+        return body, content[len(body):]
@@ -0,0 +1,34 @@
+"""
+HTTP session helper shared by strategies and the asset downloader
+"""
+
+import aiohttp
+from contextlib import asynccontextmanager
+
+def resolve_per_host_limit(max_concurrent, per_host_limit=None):
+    """Effective per-host connection cap under an overall max_concurrent limit
+
+    Defaults to min(max_concurrent, 10). An explicit 0 means no per-host
+    cap (as in aiohttp), which leaves max_concurrent as the effective cap.
+    """
+    if per_host_limit is None:
+        return min(max_concurrent, 10)
+    if per_host_limit == 0:
+        return max_concurrent
+    return min(per_host_limit, max_concurrent)
+
+@asynccontextmanager
+async def session_scope(session=None, timeout=30, **connector_options):
+    """Yield an injected session as-is, or a new one that is closed on exit
+
+    Extra keyword arguments configure the TCPConnector of the new session.
+    They are ignored for an injected session, whose own connector applies.
+    """
+    if session is not None:
+        yield session
+        return
+
+    connector = aiohttp.TCPConnector(**connector_options) if connector_options else None
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as own_session:
+        yield own_session